@@ -1,8 +1,11 @@
 import streamlit as st  # <--- THE WEB FRAMEWORK
 import requests
 import pandas as pd
-import matplotlib.pyplot as plt
 import numpy as np
+import orjson
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse, parse_qs
 
 # --- CONFIGURATION ---
 import os
@@ -17,8 +20,21 @@ except FileNotFoundError:
     st.error("Secrets not found. Please configure .streamlit/secrets.toml or Streamlit Cloud Secrets.")
     st.stop()
 
-# 3. Define HEADERS *after* we successfully have the token
-HEADERS = {"Authorization": f"token {GITHUB_TOKEN}"}
+# 3. Auth headers are set on the session, built *after* we successfully have the token
+# 4. st.cache_resource keeps one session alive across reruns, so its keep-alive
+#    connections are reused by every page of every scan (not rebuilt per click)
+@st.cache_resource(show_spinner=False)
+def get_session(token):
+    session = requests.Session()
+    session.headers.update({"Authorization": f"token {token}", "Accept-Encoding": "gzip", "Accept": "application/vnd.github+json"})
+    # Big enough pool that all the pagination worker threads can keep their connections alive
+    session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=16))
+    return session
+
+MAX_PAGES = 10  # 100 items per page -> scan at most 1000 commits / issues
+MAX_ETAG_ENDPOINTS = 4  # remember ETags for the last 2 repos (commits + issues each)
+GITHUB_DATE_FORMAT = '%Y-%m-%dT%H:%M:%SZ'  # GitHub always sends e.g. 2024-01-31T17:05:00Z
+MAX_BARS = 40  # detailed leaderboard cap, so huge repos don't draw hundreds of bars
 
 # --- PAGE SETUP ---
 st.set_page_config(page_title="GitHub Health Check", page_icon="🏥", layout="wide")
@@ -33,216 +49,327 @@ searched_dev = st.sidebar.text_input("Compare Developer (Optional)", value="")
 
 # <--- NEW ADDITION STARTS HERE --->
 st.sidebar.divider()
-view_mode = st.sidebar.radio("Chart View Mode:", ["Top 5 Developers", "Show All (Detailed)"])
+VIEW_TOP_5 = "Top 5 Developers"
+view_mode = st.sidebar.radio("Chart View Mode:", [VIEW_TOP_5, f"Top {MAX_BARS} Developers (Detailed)"])
 # <--- NEW ADDITION ENDS HERE --->
 
 btn_scan = st.sidebar.button("Run Health Check")
+btn_refresh = st.sidebar.button("Force Refresh")
 
 # --- THE LOGIC (REFACTORED FOR WEB) ---
+class GitHubAPIError(Exception):
+    # Raised (not returned) on a failed fetch: st.cache_data never caches exceptions,
+    # so a rate-limited or broken scan isn't stuck in the cache for 10 minutes
+    def __init__(self, status):
+        super().__init__(f"Error: {status}")
+        self.status = status
+
+def commit_rows(items):
+    # Keep only what the dashboard uses: (author name, date string)
+    return [(item['commit']['author']['name'], item['commit']['author']['date'])
+            for item in items if item['commit']['author']]
+
+def issue_rows(items):
+    # Keep only (created_at, closed_at), skipping PRs
+    return [(item['created_at'], item['closed_at']) for item in items if 'pull_request' not in item]
+
+def fetch_page(session, url, page, etags, extract):
+    """Fetch one page of a GitHub list endpoint. Returns (status, rows, last_page)."""
+    page_url = f"{url}&page={page}"
+    etag, cached_rows, cached_last = etags.get(page_url, (None, None, page))
+    headers = {"If-None-Match": etag} if etag else {}
+    response = session.get(page_url, headers=headers)
+
+    # 304 = nothing changed since last time, and it doesn't cost any rate limit
+    if response.status_code == 304:
+        return 200, cached_rows, cached_last
+    if response.status_code != 200:
+        return response.status_code, None, page
+
+    items = orjson.loads(response.content) # decodes the raw bytes, much faster than response.json()
+    rows = extract(items)
+    last_page = page
+    if 'last' in response.links:
+        last_page = int(parse_qs(urlparse(response.links['last']['url']).query)['page'][0])
+    if 'ETag' in response.headers:
+        # Only the extracted rows are kept, not the raw JSON payload
+        etags[page_url] = (response.headers['ETag'], rows, last_page)
+    return 200, rows, last_page
+
+def etag_store(url):
+    """Per-endpoint ETag dict, keeping only the most recently used endpoints."""
+    store = st.session_state.setdefault("etags", {})
+    etags = store.pop(url, {})
+    store[url] = etags # re-insert = mark as most recently used
+    while len(store) > MAX_ETAG_ENDPOINTS:
+        store.pop(next(iter(store)))
+    return etags
+
+def fetch_all_pages(url, extract):
+    """Fetch page 1, read the 'last' link, then grab the remaining pages in parallel."""
+    # Streamlit state/caches aren't reachable from worker threads, so look up the
+    # shared session and ETag dict here and hand them to the workers directly
+    session = get_session(GITHUB_TOKEN)
+    etags = etag_store(url)
+    status, rows, last_page = fetch_page(session, url, 1, etags, extract)
+    if status != 200:
+        raise GitHubAPIError(status)
+    last_page = min(last_page, MAX_PAGES)
+
+    if last_page > 1:
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            pages = list(executor.map(lambda page: fetch_page(session, url, page, etags, extract), range(2, last_page + 1)))
+        # A single failed page (e.g. a 403 secondary rate limit) fails the whole fetch,
+        # otherwise the stats would quietly be built (and cached) from a partial history
+        for page_status, _, _ in pages:
+            if page_status != 200:
+                raise GitHubAPIError(page_status)
+        rows = rows + [row for _, page_rows, _ in pages for row in page_rows]
+    return rows
+
+# Cached per (owner, repo) for 10 minutes so reruns don't burn the API rate limit
+@st.cache_data(ttl=600, show_spinner=False)
 def fetch_data(owner, repo):
     url = f"https://api.github.com/repos/{owner}/{repo}/commits?per_page=100"
-    response = requests.get(url, headers=HEADERS)
-    
-    if response.status_code != 200:
-        return None, f"Error: {response.status_code}"
+    rows = fetch_all_pages(url, commit_rows)
     
-    data = response.json()
-    if not data:
+    if not rows:
         return None, "Repository is empty."
         
-    # Parse
-    commit_list = []
-    for item in data:
-        if item['commit']['author']:
-            name = item['commit']['author']['name']
-            date_str = item['commit']['author']['date']
-            dt_obj = pd.to_datetime(date_str)
-            commit_list.append({"author": name, "date": dt_obj})
+    # Parse (raw strings were collected per page, convert all dates in one go)
+    df = pd.DataFrame(rows, columns=['author', 'date'])
+    df['date'] = pd.to_datetime(df['date'], utc=True, format=GITHUB_DATE_FORMAT, exact=True, cache=True)
+    # Few unique names -> store small int codes. Categories are listed in first-seen order
+    # (newest committer first) so value_counts() breaks ties the same way object dtype does
+    df['author'] = df['author'].astype(pd.CategoricalDtype(pd.unique(df['author'])))
             
-    return pd.DataFrame(commit_list), None
+    return df, None
 
+@st.cache_data(ttl=600, show_spinner=False)
 def fetch_issues(owner, repo):
     url = f"https://api.github.com/repos/{owner}/{repo}/issues?state=closed&per_page=100"
-    res = requests.get(url, headers=HEADERS)
+    issues = fetch_all_pages(url, issue_rows)
+    if not issues: return 0, 0
+
+    # Parse straight into epoch-second arrays (GitHub dates are UTC, numpy wants them without the 'Z')
+    created = np.fromiter((created_at[:-1] for created_at, _ in issues), dtype='datetime64[s]', count=len(issues))
+    closed = np.fromiter((closed_at[:-1] for _, closed_at in issues), dtype='datetime64[s]', count=len(issues))
+    # Wait times in hours; float32 is plenty of precision for an average shown as "x.y days"
+    wait_hours = (closed - created).astype(np.float32) / np.float32(3600)
+        
+    return float(wait_hours.mean()), wait_hours.size
+
+def run_scan(owner, repo):
+    # Fetch + crunch everything once; the result lives in st.session_state so
+    # reruns caused by other widgets (view mode, compare dev) skip straight to rendering
+    try:
+        df, error = fetch_data(owner, repo)
+    except GitHubAPIError as e:
+        error = str(e)
+    if error:
+        return {"key": (owner, repo), "error": error}
+
+    # 1. CALCULATIONS
+    total_commits = len(df)
+    # .values gives plain UTC datetime64, so no pandas Timestamp/Timedelta objects are built
+    last_commit_date = df['date'].values[0]
+    today = np.datetime64('now', 's')
+    days_inactive = int((today - last_commit_date) // np.timedelta64(1, 'D'))
     
-    if res.status_code != 200: return 0, 0
+    author_counts = df['author'].value_counts()
+    counts_map = author_counts.to_dict() # plain dict for fast name lookups, still sorted by count
+    lead_name, lead_count = next(iter(counts_map.items()))
+    lead_dominance = (lead_count / total_commits) * 100
     
-    data = res.json()
-    wait_times = []
-    for item in data:
-        if 'pull_request' in item: continue # Skip PRs
-        created = pd.to_datetime(item['created_at'])
-        closed = pd.to_datetime(item['closed_at'])
-        diff = (closed - created).total_seconds() / 3600
-        wait_times.append(diff)
-        
-    if not wait_times: return 0, 0
-    return np.mean(wait_times), len(wait_times)
+    # Pull day-of-week (Monday = 0) and hour out of the dates once, as compact int8 arrays
+    dt = df['date'].dt
+    dow = dt.dayofweek.to_numpy().astype(np.int8)
+    hr = dt.hour.to_numpy().astype(np.int8)
+
+    # Weekend Logic
+    weekend_percent = float((dow >= 5).mean()) * 100
+
+    # Heatmap Logic: count commits per (day, hour) cell -> 7x24 grid
+    # (upcast before combining, dow * 24 + hr goes up to 167 which doesn't fit in int8)
+    heatmap_counts = np.bincount(dow.astype(np.intp) * 24 + hr, minlength=168).reshape(7, 24)
+    
+    # Issues Logic
+    try:
+        avg_hours, issue_count = fetch_issues(owner, repo)
+    except GitHubAPIError:
+        avg_hours, issue_count = 0, 0
+    avg_days = avg_hours / 24
+
+    return {
+        "key": (owner, repo),
+        "error": None,
+        "days_inactive": days_inactive,
+        "author_counts": author_counts,
+        "counts_map": counts_map,
+        "lead_name": lead_name,
+        "lead_count": lead_count,
+        "lead_dominance": lead_dominance,
+        "weekend_percent": weekend_percent,
+        "heatmap_counts": heatmap_counts,
+        "avg_days": avg_days,
+        "issue_count": issue_count,
+    }
 
 # --- MAIN APP UI ---
 st.title(f"🏥 GitHub Health Dashboard")
 
+if btn_refresh:
+    # Drop cached API responses so the next scan hits GitHub again
+    fetch_data.clear()
+    fetch_issues.clear()
+    st.session_state.pop('scan', None)
+    st.session_state.pop('etags', None)
+    st.sidebar.success("Cache cleared. Run the Health Check again.")
+
 if btn_scan:
     with st.spinner(f"Spying on {owner_name}/{repo_name}..."):
-        df, error = fetch_data(owner_name, repo_name)
+        st.session_state['scan'] = run_scan(owner_name, repo_name)
+
+scan = st.session_state.get('scan')
+if scan and scan['key'] == (owner_name, repo_name):
+    if scan['error']:
+        st.error(scan['error'])
+    else:
+        # Charting lib is only needed once there's something to draw; importing it
+        # here keeps the empty first page fast (sys.modules caches it after that)
+        import altair as alt
+
+        days_inactive = scan['days_inactive']
+        author_counts = scan['author_counts']
+        counts_map = scan['counts_map']
+        lead_name, lead_count = scan['lead_name'], scan['lead_count']
+        lead_dominance = scan['lead_dominance']
+        weekend_percent = scan['weekend_percent']
+        avg_days, issue_count = scan['avg_days'], scan['issue_count']
+
+        # ------------------------------------------------
+        # UI SECTION 1: KEY METRICS (Big Numbers)
+        # ------------------------------------------------
+        st.markdown("### 📊 Key Vitals")
+        col1, col2, col3, col4 = st.columns(4)
         
-        if error:
-            st.error(error)
-        else:
-            # 1. CALCULATIONS
-            total_commits = len(df)
-            last_commit_date = df.iloc[0]['date']
-            today = pd.Timestamp.now(tz='UTC')
-            days_inactive = (today - last_commit_date).days
-            
-            author_counts = df['author'].value_counts()
-            lead_name = author_counts.index[0]
-            lead_count = author_counts.iloc[0]
-            lead_dominance = (lead_count / total_commits) * 100
-            
-            # Weekend Logic
-            df['day_of_week'] = df['date'].dt.dayofweek
-            weekend_percent = (len(df[df['day_of_week'] >= 5]) / total_commits) * 100
-            
-            # Issues Logic
-            avg_hours, issue_count = fetch_issues(owner_name, repo_name)
-            avg_days = avg_hours / 24
-
-            # ------------------------------------------------
-            # UI SECTION 1: KEY METRICS (Big Numbers)
-            # ------------------------------------------------
-            st.markdown("### 📊 Key Vitals")
-            col1, col2, col3, col4 = st.columns(4)
-            
-            # Status
-            status_label = "ALIVE" if days_inactive < 30 else "ZOMBIE"
-            status_color = "normal" if days_inactive < 30 else "off"
-            col1.metric("Activity Status", status_label, f"{days_inactive} days inactive", delta_color=status_color)
-            
-            # Risk
-            risk_label = "HIGH" if lead_dominance > 50 else "LOW"
-            col2.metric("Bus Factor Risk", risk_label, f"{lead_dominance:.1f}% Dominance", delta_color="inverse")
-            
-            # Burnout
-            burnout_label = "High" if weekend_percent > 30 else "Healthy"
-            col3.metric("Weekend Work", f"{weekend_percent:.1f}%", burnout_label, delta_color="inverse")
-            
-            # Support
-            col4.metric("Avg Issue Fix Time", f"{avg_days:.1f} Days", f"{issue_count} analyzed")
+        # Status
+        status_label = "ALIVE" if days_inactive < 30 else "ZOMBIE"
+        status_color = "normal" if days_inactive < 30 else "off"
+        col1.metric("Activity Status", status_label, f"{days_inactive} days inactive", delta_color=status_color)
+        
+        # Risk
+        risk_label = "HIGH" if lead_dominance > 50 else "LOW"
+        col2.metric("Bus Factor Risk", risk_label, f"{lead_dominance:.1f}% Dominance", delta_color="inverse")
+        
+        # Burnout
+        burnout_label = "High" if weekend_percent > 30 else "Healthy"
+        col3.metric("Weekend Work", f"{weekend_percent:.1f}%", burnout_label, delta_color="inverse")
+        
+        # Support
+        col4.metric("Avg Issue Fix Time", f"{avg_days:.1f} Days", f"{issue_count} analyzed")
 
-            st.divider()
+        st.divider()
 
-            # ------------------------------------------------
-            # UI SECTION 2: VISUALIZATION
-            # ------------------------------------------------
-            st.markdown("### 👁️ Deep Dive Visualization")
-            
-            # Create two separate columns in Streamlit
-            col_viz1, col_viz2 = st.columns(2)
-
-           # --- LEFT COLUMN: BAR CHART (LEADERBOARD) ---
-            with col_viz1:
-                fig1, ax1 = plt.subplots(figsize=(6, 8))
-                
-                # Data Prep
-                if view_mode == "Top 5 (Clean)":
-                    data_slice = author_counts.head(5)
-                    labels = list(data_slice.index)
-                    values = list(data_slice.values)
-                else:
-                    data_slice = author_counts
-                    labels = list(data_slice.index)
-                    values = list(data_slice.values)
-
-                # Plotting Horizontal Bars
-                bars = ax1.bar(labels, values, color="#4CAF50") # Google Green color
-                
-                # Formatting
-                ax1.set_title(f"Commit Leaderboard ({view_mode})")
-                ax1.set_xlabel("Number of Commits")
-
-                # --- THE FIX: Rotate 90 degrees ---
-                ax1.set_xticks(range(len(labels)))
-                # rotation=90 makes them vertical. ha='center' aligns them perfectly under the tick marks.
-                ax1.set_xticklabels(labels, rotation=90, ha='center', fontsize=9)
-                
-                # Add the numbers inside the bars (Data Labels)
-                for bar in bars:
-                    height = bar.get_height()
-                    ax1.text(
-                        bar.get_x() + bar.get_width()/2, # X center of bar
-                        height,                          # Y (top of bar)
-                        f'{int(height)}',                # The Label
-                        ha='center', va='bottom',        # Alignment
-                        fontweight='bold', fontsize=9
-                    )
-                
-                # Remove ugly borders
-                ax1.spines['top'].set_visible(False)
-                ax1.spines['right'].set_visible(False)
-                plt.tight_layout()
-                st.pyplot(fig1)
-
-            # --- RIGHT COLUMN: HEATMAP ---
-            with col_viz2:
-                # Create a new, dedicated figure for the heatmap
-                fig2, ax2 = plt.subplots(figsize=(8, 6))
-                
-                # Data prep
-                df['hour'] = df['date'].dt.hour
-                df['day_name'] = df['date'].dt.day_name()
-                day_order = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
-                df['day_index'] = pd.Categorical(df['day_name'], categories=day_order, ordered=True).codes
-                heatmap_data = df.groupby(['day_index', 'hour']).size().reset_index(name='count')
-                
-                # Plotting
-                sc = ax2.scatter(
-                    heatmap_data['hour'], 
-                    heatmap_data['day_index'], 
-                    s=heatmap_data['count']*50, 
-                    c=heatmap_data['count'], 
-                    cmap='Reds', 
-                    alpha=0.7, 
-                    edgecolors='grey'
-                )
-                ax2.set_title("Work Culture Map")
-                ax2.set_yticks(range(7))
-                ax2.set_yticklabels(day_order)
-                ax2.set_xticks(range(0, 24, 2))
-                ax2.grid(True, linestyle='--', alpha=0.5)
-                # Add a colorbar for context
-                plt.colorbar(sc, ax=ax2, label="Commits")
-                
-                # Display this figure in the right column
-                st.pyplot(fig2)
-
-            # ------------------------------------------------
-            # UI SECTION 3: INSIGHTS
-            # ------------------------------------------------
-            st.divider()
-            col_insight_1, col_insight_2 = st.columns(2)
-            
-            with col_insight_1:
-                st.subheader("🧠 Behavior Analysis")
-                if weekend_percent > 30:
-                    st.warning("🚜 **The Weekend Warrior:** High weekend activity detected.")
-                elif weekend_percent < 5:
-                    st.success("👔 **The 9-to-5 Pro:** Professional weekday schedule.")
-                else:
-                    st.info("⚖️ **Balanced Schedule:** Standard mix of work.")
-
-            with col_insight_2:
-                st.subheader("⚔️ Team Battle")
-                if searched_dev:
-                    if searched_dev in author_counts:
-                        user_commits = author_counts[searched_dev]
-                        gap = lead_count - user_commits
-                        st.info(f"**{searched_dev}** has {user_commits} commits.")
-                        if gap > 0:
-                            st.write(f"📉 Trailing Lead ({lead_name}) by **{gap}** commits.")
-                        else:
-                            st.write("👑 You are the Lead!")
+        # ------------------------------------------------
+        # UI SECTION 2: VISUALIZATION
+        # ------------------------------------------------
+        st.markdown("### 👁️ Deep Dive Visualization")
+        
+        # Create two separate columns in Streamlit
+        col_viz1, col_viz2 = st.columns(2)
+
+        # --- LEFT COLUMN: BAR CHART (LEADERBOARD) ---
+        # Altair charts ship a few KB of JSON and render in the browser,
+        # instead of rasterizing a matplotlib PNG on the server every rerun.
+        with col_viz1:
+            # Data Prep (author_counts is already sorted, so head() is the leaderboard)
+            if view_mode == VIEW_TOP_5:
+                data_slice = author_counts.head(5)
+            else:
+                data_slice = author_counts.head(MAX_BARS)
+            # Plain string labels + int32 counts keep the payload sent to the browser small
+            bar_data = pd.DataFrame({
+                "author": np.asarray(data_slice.index, dtype=object),
+                "commits": data_slice.to_numpy().astype(np.int32, copy=False),
+            })
+
+            # Say so in the title when the leaderboard doesn't show every author
+            if len(data_slice) < len(author_counts):
+                leaderboard_title = f"Commit Leaderboard (top {len(data_slice)} of {len(author_counts)})"
+            else:
+                leaderboard_title = f"Commit Leaderboard (all {len(author_counts)})"
+
+            # Plotting Bars (sorted like a leaderboard, highest first)
+            bars = alt.Chart(bar_data).mark_bar(color="#4CAF50").encode( # Google Green color
+                x=alt.X("author:N", sort="-y", title=None, axis=alt.Axis(labelAngle=-90)),
+                y=alt.Y("commits:Q", title="Number of Commits"),
+                tooltip=["author", "commits"],
+            )
+            # Add the numbers on top of the bars (Data Labels)
+            bar_labels = bars.mark_text(dy=-6, fontWeight="bold", fontSize=9).encode(text="commits:Q")
+
+            st.altair_chart(
+                (bars + bar_labels).properties(title=leaderboard_title, height=500),
+                width="stretch",
+            )
+
+        # --- RIGHT COLUMN: HEATMAP ---
+        with col_viz2:
+            # Data prep: flatten the 7x24 count grid as-is (row-major = day by day)
+            counts = scan['heatmap_counts']
+            day_order = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+            heatmap_data = pd.DataFrame({
+                "day": np.repeat(day_order, 24),
+                "hour": np.tile(np.arange(24), 7),
+                "count": counts.ravel(),
+            })
+
+            max_count = max(int(counts.max()), 1)
+
+            # Plotting: one colored cell per (day, hour), the browser does the coloring
+            heatmap = alt.Chart(heatmap_data).mark_rect(stroke="white").encode(
+                x=alt.X("hour:O", title="Hour (UTC)"),
+                y=alt.Y("day:O", title=None, sort=day_order),
+                # Plain gradient strip labelled with just min/max, like a static colorbar
+                color=alt.Color(
+                    "count:Q",
+                    scale=alt.Scale(scheme="reds", domain=[0, max_count]),
+                    legend=alt.Legend(title="Commits", values=[0, max_count]),
+                ),
+                tooltip=["day", "hour", "count"],
+            )
+
+            # Display this chart in the right column
+            st.altair_chart(heatmap.properties(title="Work Culture Map", height=500), width="stretch")
+
+        # ------------------------------------------------
+        # UI SECTION 3: INSIGHTS
+        # ------------------------------------------------
+        st.divider()
+        col_insight_1, col_insight_2 = st.columns(2)
+        
+        with col_insight_1:
+            st.subheader("🧠 Behavior Analysis")
+            if weekend_percent > 30:
+                st.warning("🚜 **The Weekend Warrior:** High weekend activity detected.")
+            elif weekend_percent < 5:
+                st.success("👔 **The 9-to-5 Pro:** Professional weekday schedule.")
+            else:
+                st.info("⚖️ **Balanced Schedule:** Standard mix of work.")
+
+        with col_insight_2:
+            st.subheader("⚔️ Team Battle")
+            if searched_dev:
+                if searched_dev in counts_map:
+                    user_commits = counts_map[searched_dev]
+                    gap = lead_count - user_commits
+                    st.info(f"**{searched_dev}** has {user_commits} commits.")
+                    if gap > 0:
+                        st.write(f"📉 Trailing Lead ({lead_name}) by **{gap}** commits.")
                     else:
-                        st.error(f"Developer '{searched_dev}' not found in recent history.")
+                        st.write("👑 You are the Lead!")
                 else:
-                    st.write("Enter a name in the sidebar to compare vs the Lead Dev.")
\ No newline at end of file
+                    st.error(f"Developer '{searched_dev}' not found in recent history.")
+            else:
+                st.write("Enter a name in the sidebar to compare vs the Lead Dev.")
\ No newline at end of file